@@ -5,29 +5,44 @@ Dependencies: Python 3, GTK 3, VTE 2.91
     sudo apt install python3-gi gir1.2-vte-2.91 libvte-2.91-0
 """
 
+import collections
+import colorsys
+import functools
 import json
 import os
 import random
-import subprocess
+import stat
 import sys
+import tempfile
 
 import gi
 
 gi.require_version("Gdk", "3.0")
+gi.require_version("Gio", "2.0")
 gi.require_version("Gtk", "3.0")
 gi.require_version("Vte", "2.91")
 
-from gi.repository import Gdk, GLib, Gtk, Pango, Vte  # noqa: E402
+from gi.repository import Gdk, Gio, GLib, Gtk, Pango, Vte  # noqa: E402
 
 # ── Constants ──────────────────────────────────────────────────────────────────
 
 PCRE2_CASELESS = 0x00000008
 PCRE2_MULTILINE = 0x00000400
-URL_PATTERN = r"(https?://|ftp://|www\.)[^\s)>\]\"']*"
+PCRE2_JIT_COMPLETE = 0x00000001
+CSS_POOL_SIZE = 16
+SEARCH_DEBOUNCE_MS = 80
+SEARCH_REGEX_CACHE_SIZE = 64
+TITLE_POLL_SECONDS = 30
+MAX_PANE_DEPTH = 20
+# Length-bounded so PCRE2 never scans unbounded runs; stops at whitespace,
+# quotes and closing brackets like the original pattern
+_URL_CHARS = r"[^\s)>\]\"']{0,2048}"
+URL_PATTERN = r"(?:https?://|ftp://|www\.)" + _URL_CHARS
 
 CONFIG_DIR = os.path.expanduser("~/.config/z4term")
 CONFIG_FILE = os.path.join(CONFIG_DIR, "config.json")
 SESSION_FILE = os.path.join(CONFIG_DIR, "session.json")
+_HOME_DIR = os.environ.get("HOME", "/")
 
 # ── Themes ─────────────────────────────────────────────────────────────────────
 
@@ -109,7 +124,8 @@ DEFAULTS = {
 
 
 def load_config():
-    cfg = json.loads(json.dumps(DEFAULTS))  # deep copy
+    # DEFAULTS only nests one dict deep, so this is a full copy
+    cfg = {**DEFAULTS, "keybindings": dict(DEFAULTS["keybindings"])}
     try:
         with open(CONFIG_FILE) as fh:
             user = json.load(fh)
@@ -120,8 +136,15 @@ def load_config():
         pass
     if cfg["shell"] is None:
         cfg["shell"] = os.environ.get("SHELL", "/bin/bash")
-    # Validate shell path: must exist and be executable
-    if not os.path.isfile(cfg["shell"]) or not os.access(cfg["shell"], os.X_OK):
+    # Validate shell path: must be a regular file this user can execute.
+    # os.access covers ownership and noexec mounts, not just the mode bits.
+    try:
+        shell_ok = stat.S_ISREG(os.stat(cfg["shell"]).st_mode) and os.access(
+            cfg["shell"], os.X_OK
+        )
+    except (OSError, TypeError, ValueError):
+        shell_ok = False
+    if not shell_ok:
         cfg["shell"] = "/bin/bash"
     if cfg["theme"] not in THEMES:
         cfg["theme"] = "tango-dark"
@@ -140,8 +163,25 @@ def ensure_config():
 
 # ── Keybinding parser ─────────────────────────────────────────────────────────
 
+# Modifiers that take part in keybindings; Lock/NumLock etc. are ignored.
+# Plain ints, so keymap keys hash as int tuples rather than GFlags.
+_RELEVANT_MODS = int(
+    Gdk.ModifierType.CONTROL_MASK
+    | Gdk.ModifierType.SHIFT_MASK
+    | Gdk.ModifierType.MOD1_MASK
+    | Gdk.ModifierType.SUPER_MASK
+)
+_CTRL = int(Gdk.ModifierType.CONTROL_MASK)
+_CTRL_SHIFT = _CTRL | int(Gdk.ModifierType.SHIFT_MASK)
+
+
+@functools.lru_cache(maxsize=128)
 def _parse_binding(text):
-    """Parse 'Ctrl+Shift+D' into (keyval, modifier_mask)."""
+    """Parse 'Ctrl+Shift+D' into (keyval, modifier_mask).
+
+    The keyval is case-folded to lower case; key events are folded the same
+    way before lookup, so one keymap entry covers both cases.
+    """
     mods = 0
     keyval = None
     for part in text.split("+"):
@@ -159,9 +199,9 @@ def _parse_binding(text):
             for name in (p, p.lower(), p.upper(), p.capitalize()):
                 kv = Gdk.keyval_from_name(name)
                 if kv and kv != Gdk.KEY_VoidSymbol:
-                    keyval = kv
+                    keyval = Gdk.keyval_to_lower(kv)
                     break
-    return (keyval, mods) if keyval else (None, 0)
+    return (int(keyval), int(mods) & _RELEVANT_MODS) if keyval else (None, 0)
 
 
 def _build_keymap(bindings):
@@ -171,95 +211,182 @@ def _build_keymap(bindings):
         kv, mods = _parse_binding(binding_str)
         if kv:
             km[(kv, mods)] = action
-            # Register both letter cases so Shift combos work
-            lower = Gdk.keyval_to_lower(kv)
-            upper = Gdk.keyval_to_upper(kv)
-            if lower != upper:
-                km[(lower, mods)] = action
-                km[(upper, mods)] = action
     return km
 
 
 # ── Helpers ────────────────────────────────────────────────────────────────────
 
-def _rgba(hex_color, alpha=1.0):
+@functools.lru_cache(maxsize=256)
+def _rgba_cached(hex_color, alpha_milli):
     c = Gdk.RGBA()
     c.parse(hex_color)
-    c.alpha = alpha
+    c.alpha = alpha_milli / 1000.0
     return c
 
 
-def _theme_colors(config):
-    theme = THEMES[config["theme"]]
-    a = config["opacity"]
+def _rgba(hex_color, alpha=1.0):
+    # Alpha is quantized so cache keys aren't at the mercy of float noise
+    return _rgba_cached(hex_color, round(alpha * 1000))
+
+
+@functools.lru_cache(maxsize=32)
+def _theme_colors_cached(theme_name, opacity):
+    theme = THEMES[theme_name]
     return {
         "fg": _rgba(theme["fg"]),
-        "bg": _rgba(theme["bg"], a),
+        "bg": _rgba(theme["bg"], opacity),
         "cursor": _rgba(theme["cursor"]),
         "palette": [_rgba(h) for h in theme["palette"]],
     }
 
 
+def _theme_colors(config):
+    """Theme RGBA colors, shared by every pane with the same theme/opacity."""
+    return _theme_colors_cached(config["theme"], round(config["opacity"], 3))
+
+
+def _font_description(config):
+    return Pango.FontDescription.from_string(
+        f"{config['font_family']} {config['font_size']}"
+    )
+
+
+def _compile_url_regex():
+    """Compile URL_PATTERN, returning (regex, is_vte_regex) or (None, False)."""
+    try:
+        regex = Vte.Regex.new_for_match(
+            URL_PATTERN, -1, PCRE2_CASELESS | PCRE2_MULTILINE
+        )
+    except (AttributeError, TypeError, GLib.Error):
+        pass
+    else:
+        try:
+            regex.jit(PCRE2_JIT_COMPLETE)
+        except (AttributeError, GLib.Error):
+            pass  # the interpreter still works, just slower
+        return regex, True
+    try:
+        regex = GLib.Regex.new(
+            URL_PATTERN,
+            GLib.RegexCompileFlags.CASELESS | GLib.RegexCompileFlags.OPTIMIZE,
+            GLib.RegexMatchFlags(0),
+        )
+        return regex, False
+    except (AttributeError, GLib.Error):
+        return None, False
+
+
+# Compiled once and shared by every pane
+_URL_REGEX, _URL_REGEX_IS_VTE = _compile_url_regex()
+
+
+# VTE >= 0.46 has PCRE2-backed Vte.Regex; older versions only take GRegex
+_HAVE_VTE_REGEX = hasattr(Vte, "Regex") and hasattr(Vte.Regex, "new_for_search")
+
+
+def _compile_search_vte(escaped, flags):
+    try:
+        regex = Vte.Regex.new_for_search(escaped, -1, flags)
+    except GLib.Error:
+        return None
+    try:
+        regex.jit(PCRE2_JIT_COMPLETE)
+    except GLib.Error:
+        pass
+    return regex
+
+
+def _compile_search_gregex(escaped, flags):
+    gflags = GLib.RegexCompileFlags(0)
+    if flags & PCRE2_CASELESS:
+        gflags |= GLib.RegexCompileFlags.CASELESS
+    try:
+        return GLib.Regex.new(escaped, gflags, GLib.RegexMatchFlags(0))
+    except GLib.Error:
+        return None
+
+
+# Compile an escaped search string for this VTE (None if it won't compile).
+# Cached on (pattern, PCRE2 flags), so incremental typing and backspacing
+# reuse already compiled regexes.
+_compile_search_regex = functools.lru_cache(maxsize=SEARCH_REGEX_CACHE_SIZE)(
+    _compile_search_vte if _HAVE_VTE_REGEX else _compile_search_gregex
+)
+
+
 # ── CSS ────────────────────────────────────────────────────────────────────────
 
-def _random_bright_color():
-    """Generate a random bright color suitable for borders."""
-    h = random.random()
+def _bright_color(h):
     # Convert HSL (h, 0.7 saturation, 0.65 lightness) to RGB
-    import colorsys
     r, g, b = colorsys.hls_to_rgb(h, 0.65, 0.7)
-    return f"#{int(r*255):02x}{int(g*255):02x}{int(b*255):02x}"
+    return b"#%02x%02x%02x" % (int(r*255), int(g*255), int(b*255))
 
 
-def _build_css():
-    colors = [_random_bright_color() for _ in range(4)]
-    return f"""
-window {{
+# Bright border colors spread evenly around the hue wheel
+_BRIGHT_COLORS = tuple(_bright_color(i / 256) for i in range(256))
+
+
+def _random_bright_color():
+    """Pick a random bright color suitable for borders, as CSS bytes."""
+    return _BRIGHT_COLORS[random.randrange(256)]
+
+
+# Static stylesheet; only the @@Cn@@ border color tokens vary per build
+_CSS_TEMPLATE = b"""
+window {
     background-color: #1e1e2e;
-}}
-notebook header tabs tab {{
+}
+notebook header tabs tab {
     padding: 4px 12px;
-}}
-paned > separator {{
+}
+paned > separator {
     min-width: 2px;
     min-height: 2px;
     background-color: #444;
-}}
-#tip-bar {{
+}
+#tip-bar {
     background-color: #2a2a3e;
     padding: 6px 14px;
-}}
-#tip-bar-title {{
+}
+#tip-bar-title {
     font-weight: bold;
     font-size: 14px;
     color: #cdd6f4;
-}}
-#tip-bar-text {{
+}
+#tip-bar-text {
     font-size: 12px;
-}}
-vte-terminal {{
+}
+vte-terminal {
     transition: border-color 0.4s ease-in-out;
-}}
-vte-terminal.focused {{
-    border-top: 2px solid {colors[0]};
-    border-right: 2px solid {colors[1]};
-    border-bottom: 2px solid {colors[2]};
-    border-left: 2px solid {colors[3]};
-}}
-vte-terminal.unfocused {{
+}
+vte-terminal.focused {
+    border-top: 2px solid @@C0@@;
+    border-right: 2px solid @@C1@@;
+    border-bottom: 2px solid @@C2@@;
+    border-left: 2px solid @@C3@@;
+}
+vte-terminal.unfocused {
     border: 2px solid transparent;
-}}
-.tab-activity label {{
+}
+.tab-activity label {
     color: #f9e2af;
-}}
-#search-bar {{
+}
+#search-bar {
     background-color: #2a2a3e;
     padding: 4px 8px;
-}}
-#search-bar entry {{
+}
+#search-bar entry {
     min-height: 28px;
-}}
-""".encode()
+}
+"""
+_CSS_COLOR_TOKENS = (b"@@C0@@", b"@@C1@@", b"@@C2@@", b"@@C3@@")
+
+
+def _build_css():
+    css = _CSS_TEMPLATE
+    for token in _CSS_COLOR_TOKENS:
+        css = css.replace(token, _random_bright_color())
+    return css
 
 
 def _tip(key, action):
@@ -283,6 +410,9 @@ TIP_MARKUP = (
     + _tip("Right-Click", "Menu")
 )
 
+# Parsed once; every window's tip label shares the same attribute list
+_, _TIP_ATTRS, _TIP_TEXT, _ = Pango.parse_markup(TIP_MARKUP, -1, "\0")
+
 
 # ── Terminal Pane ──────────────────────────────────────────────────────────────
 
@@ -294,6 +424,8 @@ class TerminalPane(Vte.Terminal):
         self._window = window
         self._child_pid = None
         self._unfocused_since = None
+        self._focused = False
+        self._activity_marked = False
         cfg = window.config
 
         # Font
@@ -317,6 +449,7 @@ class TerminalPane(Vte.Terminal):
 
         # Tab title from terminal title
         self.connect("window-title-changed", self._on_title_changed)
+        self.connect("current-directory-uri-changed", self._on_cwd_changed)
 
         # Activity / notification tracking
         self.connect("bell", self._on_bell)
@@ -330,7 +463,7 @@ class TerminalPane(Vte.Terminal):
         self.get_style_context().add_class("unfocused")
 
         # Spawn shell
-        spawn_dir = cwd or os.environ.get("HOME", "/")
+        spawn_dir = cwd or _HOME_DIR
         self.spawn_async(
             Vte.PtyFlags.DEFAULT,
             spawn_dir,
@@ -349,27 +482,21 @@ class TerminalPane(Vte.Terminal):
         self.show()
 
     def _apply_font(self, cfg):
-        desc = Pango.FontDescription.from_string(
-            f"{cfg['font_family']} {cfg['font_size']}"
-        )
+        self._apply_font_desc(_font_description(cfg))
+
+    def _apply_font_desc(self, desc):
         self.set_font(desc)
 
     def _setup_url_matching(self):
+        if _URL_REGEX is None:
+            return
         try:
-            regex = Vte.Regex.new_for_match(
-                URL_PATTERN, -1, PCRE2_CASELESS | PCRE2_MULTILINE
-            )
-            tag = self.match_add_regex(regex, 0)
-        except (AttributeError, TypeError, GLib.Error):
-            try:
-                regex = GLib.Regex.new(
-                    URL_PATTERN,
-                    GLib.RegexCompileFlags.CASELESS,
-                    GLib.RegexMatchFlags(0),
-                )
-                tag = self.match_add_gregex(regex, 0)
-            except (AttributeError, GLib.Error):
-                return
+            if _URL_REGEX_IS_VTE:
+                tag = self.match_add_regex(_URL_REGEX, 0)
+            else:
+                tag = self.match_add_gregex(_URL_REGEX, 0)
+        except (AttributeError, TypeError):
+            return
         self.match_set_cursor_name(tag, "pointer")
 
     # ── Callbacks ──────────────────────────────────────────────────────────────
@@ -381,14 +508,19 @@ class TerminalPane(Vte.Terminal):
             self._child_pid = pid
 
     def _on_focus(self, _widget, _event):
+        self._unfocused_since = None
+        # Already the styled pane (e.g. window regained focus): nothing to do
+        if self._focused:
+            return False
         prev = self._window.focused_terminal
         if prev and prev is not self:
             prev.get_style_context().remove_class("focused")
             prev.get_style_context().add_class("unfocused")
+            prev._focused = False
             prev._unfocused_since = GLib.get_monotonic_time()
         self.get_style_context().remove_class("unfocused")
         self.get_style_context().add_class("focused")
-        self._unfocused_since = None
+        self._focused = True
         self._window.focused_terminal = self
         self._window._clear_tab_activity(self)
         self._window.refresh_border_colors()
@@ -406,6 +538,23 @@ class TerminalPane(Vte.Terminal):
         if title:
             self._window._update_tab_title_for(self, title)
 
+    def _on_cwd_changed(self, _terminal):
+        # Shell reported its directory via OSC 7; an explicit title wins
+        if self.get_window_title():
+            return
+        # Follow the poll: only the tab's first pane names the tab
+        panes = self._window._tab_panes.get(self._window._pane_to_tab.get(self))
+        if not panes or panes[0] is not self:
+            return
+        uri = self.get_current_directory_uri()
+        if not uri:
+            return
+        try:
+            path, _host = GLib.filename_from_uri(uri)
+        except GLib.Error:
+            return
+        self._window._update_tab_title_for(self, os.path.basename(path) or path)
+
     def _on_bell(self, _terminal):
         if self is not self._window.focused_terminal:
             self._window._mark_tab_activity(self)
@@ -421,8 +570,10 @@ class TerminalPane(Vte.Terminal):
                     )
 
     def _on_contents_changed(self, _terminal):
-        if self is not self._window.focused_terminal:
-            self._window._mark_tab_activity(self)
+        # Fires for every screen update; bail out once the tab is marked
+        if self._activity_marked or self is self._window.focused_terminal:
+            return
+        self._window._mark_tab_activity(self)
 
     def _on_button_press(self, _widget, event):
         # Right-click → context menu
@@ -449,18 +600,72 @@ class TerminalPane(Vte.Terminal):
         return None
 
 
+# ── Session serialization ──────────────────────────────────────────────────────
+#
+# Each serializer returns (node, children): node is the dict for the widget
+# (None for a pass-through wrapper) and children are (slot, widget) pairs.
+
+def _ser_terminal(w):
+    return {
+        "type": "terminal",
+        "cwd": w.get_cwd() or _HOME_DIR,
+    }, ()
+
+
+def _ser_paned(w):
+    orient = (
+        "horizontal"
+        if w.get_orientation() == Gtk.Orientation.HORIZONTAL
+        else "vertical"
+    )
+    node = {
+        "type": "paned",
+        "orientation": orient,
+        "position": w.get_position(),
+        "child1": None,
+        "child2": None,
+    }
+    return node, (("child1", w.get_child1()), ("child2", w.get_child2()))
+
+
+def _ser_box(w):
+    # Tab root box: serialize its single child in its place
+    children = w.get_children()
+    return None, (((None, children[0]),) if children else ())
+
+
+# Keyed on exact widget type
+_SERIALIZERS = {
+    TerminalPane: _ser_terminal,
+    Gtk.Paned: _ser_paned,
+    Gtk.Box: _ser_box,
+}
+
+
 # ── Main Window ────────────────────────────────────────────────────────────────
 
 class TerminalWindow(Gtk.ApplicationWindow):
     """Window containing a notebook of tabs, each with a tree of panes."""
 
+    # CSS provider and its pre-built stylesheet variants, shared process-wide
+    _css_provider = None
+    _css_pool = None
+    _css_refresh_pending = False
+
     def __init__(self, config, **kwargs):
         super().__init__(**kwargs)
         self.config = config
         self.focused_terminal = None
         self._closing = False
         self._tab_counter = 0
-        self._keymap = _build_keymap(config["keybindings"])
+        # Pane registry: tab root box -> terminals in pane-tree order
+        self._tab_panes = {}
+        self._pane_to_tab = {}
+        # (Paned, position) pairs from session restore, applied in one idle
+        self._pending_positions = []
+        self._keymap = self._keymap_for(config["keybindings"])
+        # Unmodified keys only need a keymap lookup if something binds them
+        self._bare_keys = any(not mods for _kv, mods in self._keymap)
 
         self.set_title("z4term")
         self.set_default_size(960, 640)
@@ -477,22 +682,26 @@ class TerminalWindow(Gtk.ApplicationWindow):
         if settings:
             settings.set_property("gtk-application-prefer-dark-theme", True)
 
-        # CSS
-        self._css_provider = Gtk.CssProvider()
-        self._css_provider.load_from_data(_build_css())
-        Gtk.StyleContext.add_provider_for_screen(
-            screen,
-            self._css_provider,
-            Gtk.STYLE_PROVIDER_PRIORITY_APPLICATION,
-        )
+        # CSS — installed once; pre-build a pool of border color variants so
+        # focus changes only swap in ready-made bytes
+        cls = TerminalWindow
+        if cls._css_provider is None:
+            cls._css_pool = [_build_css() for _ in range(CSS_POOL_SIZE)]
+            cls._css_provider = Gtk.CssProvider()
+            cls._css_provider.load_from_data(cls._css_pool[0])
+            Gtk.StyleContext.add_provider_for_screen(
+                screen,
+                cls._css_provider,
+                Gtk.STYLE_PROVIDER_PRIORITY_APPLICATION,
+            )
 
         # ── Tip bar ───────────────────────────────────────────────────────────
         tip_bar = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL, spacing=8)
         tip_bar.set_name("tip-bar")
         title_label = Gtk.Label(label="z4term")
         title_label.set_name("tip-bar-title")
-        tip_label = Gtk.Label()
-        tip_label.set_markup(TIP_MARKUP)
+        tip_label = Gtk.Label(label=_TIP_TEXT)
+        tip_label.set_attributes(_TIP_ATTRS)
         tip_label.set_name("tip-bar-text")
         tip_label.set_ellipsize(Pango.EllipsizeMode.END)
         tip_bar.pack_start(title_label, False, False, 0)
@@ -505,6 +714,8 @@ class TerminalWindow(Gtk.ApplicationWindow):
         self.notebook.connect("switch-page", self._on_switch_page)
 
         # ── Search bar ────────────────────────────────────────────────────────
+        # Built once; toggling only reveals/conceals it, so its signal
+        # handlers and the search regex cache persist across Ctrl+Shift+F
         self._search_revealer = Gtk.Revealer()
         self._search_revealer.set_transition_type(
             Gtk.RevealerTransitionType.SLIDE_UP
@@ -515,6 +726,9 @@ class TerminalWindow(Gtk.ApplicationWindow):
         self._search_entry.set_placeholder_text("Search\u2026")
         self._search_entry.connect("activate", lambda _: self._search_next())
         self._search_entry.connect("changed", self._on_search_changed)
+        self._search_timeout_id = 0
+        self._last_search_text = ""
+        self._last_escaped = ""
         self._search_entry.connect("key-press-event", self._on_search_key)
         btn_prev = Gtk.Button(label="\u25b2")
         btn_prev.set_tooltip_text("Previous match (Shift+Enter)")
@@ -537,16 +751,41 @@ class TerminalWindow(Gtk.ApplicationWindow):
         vbox.pack_start(self._search_revealer, False, False, 0)
         self.add(vbox)
 
+        # Context menu, built once and re-targeted per right-click
+        self._context_menu_target = None
+        self._context_menu = self._build_context_menu()
+
         # Keyboard at window level
         self.connect("key-press-event", self._on_key)
         self.connect("delete-event", self._on_delete)
+        self.connect("destroy", self._on_destroy)
+
+        # CWD-based tab title fallback for shells that don't emit OSC 7
+        self._title_poll_id = GLib.timeout_add_seconds(
+            TITLE_POLL_SECONDS, self._poll_tab_titles
+        )
+
+    @classmethod
+    def refresh_border_colors(cls):
+        """Pick new random border colors for the focused pane.
 
-        # Periodic CWD-based tab title fallback
-        GLib.timeout_add_seconds(3, self._poll_tab_titles)
+        Bursts of focus changes (across all windows) are coalesced into one
+        CSS load at idle.
+        """
+        if cls._css_refresh_pending:
+            return
+        cls._css_refresh_pending = True
+        GLib.idle_add(
+            cls._do_css_refresh, priority=GLib.PRIORITY_DEFAULT_IDLE
+        )
 
-    def refresh_border_colors(self):
-        """Regenerate random border colors for the focused pane."""
-        self._css_provider.load_from_data(_build_css())
+    @classmethod
+    def _do_css_refresh(cls):
+        cls._css_refresh_pending = False
+        cls._css_provider.load_from_data(
+            cls._css_pool[random.randrange(CSS_POOL_SIZE)]
+        )
+        return False
 
     def restore_or_init(self, session_data=None):
         """Restore a previous session or create a default tab."""
@@ -562,8 +801,20 @@ class TerminalWindow(Gtk.ApplicationWindow):
         if self.notebook.get_n_pages() == 0:
             self.add_tab()
         self._update_tab_bar()
+        # Restored pages are realized here in one pass; a notebook can only
+        # select visible pages, so pick the last tab afterwards
         self.show_all()
+        self.notebook.set_current_page(-1)
+        self._focus_any()
         self._search_revealer.set_reveal_child(False)
+        if self._pending_positions:
+            GLib.idle_add(self._flush_positions)
+
+    def _flush_positions(self):
+        for paned, pos in self._pending_positions:
+            paned.set_position(pos)
+        self._pending_positions.clear()
+        return False
 
     # ── Tabs ───────────────────────────────────────────────────────────────────
 
@@ -574,13 +825,16 @@ class TerminalWindow(Gtk.ApplicationWindow):
         box = Gtk.Box(orientation=Gtk.Orientation.VERTICAL)
         box.pack_start(term, True, True, 0)
         box.show_all()
+        self._tab_panes[box] = [term]
+        self._pane_to_tab[term] = box
 
         # Tab label in EventBox for middle-click close
         label = Gtk.Label(label=f"Terminal {self._tab_counter}")
         ebox = Gtk.EventBox()
         ebox.add(label)
         ebox.connect("button-press-event", self._on_tab_label_click, box)
-        ebox.show_all()
+        label.show()
+        ebox.show()
 
         idx = self.notebook.append_page(box, ebox)
         self.notebook.set_current_page(idx)
@@ -591,13 +845,10 @@ class TerminalWindow(Gtk.ApplicationWindow):
         self.notebook.set_show_tabs(self.notebook.get_n_pages() > 1)
 
     def _on_switch_page(self, _nb, page, _num):
-        terminals = self._collect_terminals(page)
+        terminals = self._tab_panes.get(page)
         if terminals:
             GLib.idle_add(terminals[0].grab_focus)
-        # Clear activity indicator
-        label_w = self.notebook.get_tab_label(page)
-        if label_w:
-            label_w.get_style_context().remove_class("tab-activity")
+        self._clear_page_activity(page)
 
     def _on_tab_label_click(self, _widget, event, tab_box):
         """Middle-click closes the tab."""
@@ -607,6 +858,7 @@ class TerminalWindow(Gtk.ApplicationWindow):
                 self.destroy()
             else:
                 page_idx = self.notebook.page_num(tab_box)
+                self._unregister_tab(tab_box)
                 self.notebook.remove_page(page_idx)
                 self._update_tab_bar()
                 self._focus_any()
@@ -623,11 +875,9 @@ class TerminalWindow(Gtk.ApplicationWindow):
     # ── Tab titles ─────────────────────────────────────────────────────────────
 
     def _update_tab_title_for(self, terminal, title):
-        for i in range(self.notebook.get_n_pages()):
-            page = self.notebook.get_nth_page(i)
-            if terminal in self._collect_terminals(page):
-                self._set_tab_label_text(page, title)
-                break
+        page = self._pane_to_tab.get(terminal)
+        if page is not None:
+            self._set_tab_label_text(page, title)
 
     def _set_tab_label_text(self, page, text):
         label_w = self.notebook.get_tab_label(page)
@@ -639,9 +889,7 @@ class TerminalWindow(Gtk.ApplicationWindow):
                 children[0].set_text(text)
 
     def _poll_tab_titles(self):
-        for i in range(self.notebook.get_n_pages()):
-            page = self.notebook.get_nth_page(i)
-            terminals = self._collect_terminals(page)
+        for page, terminals in self._tab_panes.items():
             if terminals:
                 t = terminals[0]
                 if not t.get_window_title():
@@ -655,50 +903,80 @@ class TerminalWindow(Gtk.ApplicationWindow):
     # ── Tab activity & notifications ───────────────────────────────────────────
 
     def _mark_tab_activity(self, terminal):
-        cur_page = self.notebook.get_nth_page(self.notebook.get_current_page())
-        for i in range(self.notebook.get_n_pages()):
-            page = self.notebook.get_nth_page(i)
-            if page is cur_page:
-                continue
-            if terminal in self._collect_terminals(page):
-                label_w = self.notebook.get_tab_label(page)
-                if label_w:
-                    label_w.get_style_context().add_class("tab-activity")
-                break
+        page = self._pane_to_tab.get(terminal)
+        if page is None or page is self._current_tab_root():
+            return
+        label_w = self.notebook.get_tab_label(page)
+        if label_w:
+            label_w.get_style_context().add_class("tab-activity")
+        terminal._activity_marked = True
 
     def _clear_tab_activity(self, terminal):
-        for i in range(self.notebook.get_n_pages()):
-            page = self.notebook.get_nth_page(i)
-            if terminal in self._collect_terminals(page):
-                label_w = self.notebook.get_tab_label(page)
-                if label_w:
-                    label_w.get_style_context().remove_class("tab-activity")
-                break
+        page = self._pane_to_tab.get(terminal)
+        if page is not None:
+            self._clear_page_activity(page)
+
+    def _clear_page_activity(self, page):
+        label_w = self.notebook.get_tab_label(page)
+        if label_w:
+            label_w.get_style_context().remove_class("tab-activity")
+        for t in self._tab_panes.get(page, ()):
+            t._activity_marked = False
 
     def _send_notification(self, title, body):
+        # Talk to the notification daemon directly over D-Bus: no fork, and
+        # unlike GNotification it needs no installed .desktop file
         try:
-            subprocess.Popen(
-                ["notify-send", "-a", "z4term", title, body],
-                stdout=subprocess.DEVNULL,
-                stderr=subprocess.DEVNULL,
-            )
-        except FileNotFoundError:
-            pass
+            bus = Gio.bus_get_sync(Gio.BusType.SESSION, None)
+        except GLib.Error:
+            return
+        bus.call(
+            "org.freedesktop.Notifications",
+            "/org/freedesktop/Notifications",
+            "org.freedesktop.Notifications",
+            "Notify",
+            GLib.Variant(
+                "(susssasa{sv}i)",
+                ("z4term", 0, "", title, body, [], {}, -1),
+            ),
+            None,
+            Gio.DBusCallFlags.NONE,
+            -1,
+            None,
+            None,
+        )
 
     # ── Pane tree helpers ──────────────────────────────────────────────────────
 
+    def _register_tab(self, box):
+        """Record the terminals of a tab built outside add_tab/split_pane."""
+        terminals = self._collect_terminals(box)
+        self._tab_panes[box] = terminals
+        for t in terminals:
+            self._pane_to_tab[t] = box
+
+    def _unregister_tab(self, box):
+        for t in self._tab_panes.pop(box, ()):
+            self._pane_to_tab.pop(t, None)
+
     @staticmethod
     def _collect_terminals(widget):
-        if isinstance(widget, TerminalPane):
-            return [widget]
+        """Terminals under widget in pane-tree order (iterative walk)."""
         result = []
-        if isinstance(widget, Gtk.Paned):
-            for child in (widget.get_child1(), widget.get_child2()):
-                if child:
-                    result.extend(TerminalWindow._collect_terminals(child))
-        elif isinstance(widget, Gtk.Box):
-            for child in widget.get_children():
-                result.extend(TerminalWindow._collect_terminals(child))
+        stack = collections.deque([widget])
+        while stack:
+            w = stack.pop()
+            if isinstance(w, TerminalPane):
+                result.append(w)
+            elif isinstance(w, Gtk.Paned):
+                # Push child2 first so child1 is visited first
+                c1, c2 = w.get_child1(), w.get_child2()
+                if c2:
+                    stack.append(c2)
+                if c1:
+                    stack.append(c1)
+            elif isinstance(w, Gtk.Box):
+                stack.extend(reversed(w.get_children()))
         return result
 
     def _current_tab_root(self):
@@ -734,7 +1012,13 @@ class TerminalWindow(Gtk.ApplicationWindow):
             else:
                 parent.pack2(paned, resize=True, shrink=True)
 
-        paned.show_all()
+        # Both terminals are already shown; only the new Paned needs it
+        paned.show()
+        tab = self._pane_to_tab.get(term)
+        if tab is not None:
+            panes = self._tab_panes[tab]
+            panes.insert(panes.index(term) + 1, new_term)
+            self._pane_to_tab[new_term] = tab
 
         def _set_half(*_):
             alloc = (
@@ -754,7 +1038,7 @@ class TerminalWindow(Gtk.ApplicationWindow):
         if self._closing:
             return
         term = target or self.focused_terminal
-        if term is None:
+        if term is None or term not in self._pane_to_tab:
             return
         parent = term.get_parent()
         if parent is None:
@@ -766,12 +1050,14 @@ class TerminalWindow(Gtk.ApplicationWindow):
                 self.destroy()
                 return
             page_idx = self.notebook.page_num(parent)
+            self._unregister_tab(parent)
             self.notebook.remove_page(page_idx)
             self._update_tab_bar()
             self._focus_any()
             return
 
         if isinstance(parent, Gtk.Paned):
+            self._tab_panes[self._pane_to_tab.pop(term)].remove(term)
             is_child1 = parent.get_child1() == term
             sibling = parent.get_child2() if is_child1 else parent.get_child1()
             parent.remove(term)
@@ -789,7 +1075,6 @@ class TerminalWindow(Gtk.ApplicationWindow):
                 else:
                     grandparent.pack2(sibling, resize=True, shrink=True)
 
-            sibling.show_all()
             terminals = self._collect_terminals(sibling)
             if terminals:
                 terminals[0].grab_focus()
@@ -800,7 +1085,7 @@ class TerminalWindow(Gtk.ApplicationWindow):
         root = self._current_tab_root()
         if root is None:
             return
-        terminals = self._collect_terminals(root)
+        terminals = self._tab_panes.get(root)
         if not terminals:
             return
         try:
@@ -813,7 +1098,7 @@ class TerminalWindow(Gtk.ApplicationWindow):
     def _focus_any(self):
         root = self._current_tab_root()
         if root:
-            ts = self._collect_terminals(root)
+            ts = self._tab_panes.get(root)
             if ts:
                 ts[0].grab_focus()
 
@@ -822,17 +1107,14 @@ class TerminalWindow(Gtk.ApplicationWindow):
     def _zoom(self, direction):
         """direction: +1 bigger, -1 smaller, 0 reset."""
         if direction == 0:
-            self.config["font_size"] = int(
-                json.loads(json.dumps(DEFAULTS))["font_size"]
-            )
+            self.config["font_size"] = DEFAULTS["font_size"]
         else:
             self.config["font_size"] = max(
                 6, self.config["font_size"] + direction
             )
-        for i in range(self.notebook.get_n_pages()):
-            page = self.notebook.get_nth_page(i)
-            for t in self._collect_terminals(page):
-                t._apply_font(self.config)
+        desc = _font_description(self.config)
+        for t in self._pane_to_tab:
+            t._apply_font_desc(desc)
 
     # ── New window ─────────────────────────────────────────────────────────────
 
@@ -852,43 +1134,57 @@ class TerminalWindow(Gtk.ApplicationWindow):
 
     def _hide_search(self):
         self._search_revealer.set_reveal_child(False)
+        if self._search_timeout_id:
+            GLib.source_remove(self._search_timeout_id)
+            self._search_timeout_id = 0
         if self.focused_terminal:
-            try:
+            if _HAVE_VTE_REGEX:
                 self.focused_terminal.search_set_regex(None, 0)
-            except (AttributeError, TypeError):
-                try:
-                    self.focused_terminal.search_set_gregex(None, 0)
-                except (AttributeError, TypeError):
-                    pass
+            else:
+                self.focused_terminal.search_set_gregex(None, 0)
             self.focused_terminal.grab_focus()
 
-    def _on_search_changed(self, entry):
-        text = entry.get_text()
+    def _on_search_changed(self, _entry):
+        # Debounce: only search once typing pauses
+        if self._search_timeout_id:
+            GLib.source_remove(self._search_timeout_id)
+        self._search_timeout_id = GLib.timeout_add(
+            SEARCH_DEBOUNCE_MS, self._run_search
+        )
+
+    def _run_search(self):
+        self._search_timeout_id = 0
+        text = self._search_entry.get_text()
         term = self.focused_terminal
         if not term or not text:
-            return
-        escaped = GLib.Regex.escape_string(text)
-        try:
-            regex = Vte.Regex.new_for_search(escaped, -1, PCRE2_CASELESS)
+            return False
+        if text != self._last_search_text:
+            self._last_search_text = text
+            self._last_escaped = GLib.Regex.escape_string(text)
+        regex = _compile_search_regex(self._last_escaped, PCRE2_CASELESS)
+        if regex is None:
+            return False
+        if _HAVE_VTE_REGEX:
             term.search_set_regex(regex, 0)
-        except (AttributeError, TypeError, GLib.Error):
-            try:
-                regex = GLib.Regex.new(
-                    escaped,
-                    GLib.RegexCompileFlags.CASELESS,
-                    GLib.RegexMatchFlags(0),
-                )
-                term.search_set_gregex(regex, GLib.RegexMatchFlags(0))
-            except (AttributeError, GLib.Error):
-                return
+        else:
+            term.search_set_gregex(regex, GLib.RegexMatchFlags(0))
         term.search_set_wrap_around(True)
         term.search_find_previous()
+        return False
+
+    def _flush_pending_search(self):
+        # Apply a still-debounced edit so Enter/arrows search the current text
+        if self._search_timeout_id:
+            GLib.source_remove(self._search_timeout_id)
+            self._run_search()
 
     def _search_next(self):
+        self._flush_pending_search()
         if self.focused_terminal:
             self.focused_terminal.search_find_next()
 
     def _search_prev(self):
+        self._flush_pending_search()
         if self.focused_terminal:
             self.focused_terminal.search_find_previous()
 
@@ -906,30 +1202,40 @@ class TerminalWindow(Gtk.ApplicationWindow):
 
     # ── Context menu ───────────────────────────────────────────────────────────
 
-    def _show_context_menu(self, terminal, event):
+    # Context menu layout: (label, action name); None is a separator
+    _MENU_SPEC = (
+        ("Copy", "copy"),
+        ("Paste", "paste"),
+        None,
+        ("Split Side-by-Side", "split_vertical"),
+        ("Split Top/Bottom", "split_horizontal"),
+        None,
+        ("Search\u2026", "search"),
+        None,
+        ("Close Pane", "close_pane"),
+    )
+
+    def _build_context_menu(self):
+        """Build the pane context menu; items act on _context_menu_target."""
         menu = Gtk.Menu()
-        items = [
-            ("Copy", lambda _: terminal.copy_clipboard_format(Vte.Format.TEXT)),
-            ("Paste", lambda _: terminal.paste_clipboard()),
-            None,
-            ("Split Side-by-Side",
-             lambda _: self.split_pane(Gtk.Orientation.HORIZONTAL)),
-            ("Split Top/Bottom",
-             lambda _: self.split_pane(Gtk.Orientation.VERTICAL)),
-            None,
-            ("Search\u2026", lambda _: self._toggle_search()),
-            None,
-            ("Close Pane", lambda _: self.close_pane(terminal)),
-        ]
-        for item_data in items:
+        for item_data in self._MENU_SPEC:
             if item_data is None:
                 menu.append(Gtk.SeparatorMenuItem())
             else:
-                label, handler = item_data
+                label, action = item_data
                 mi = Gtk.MenuItem(label=label)
-                mi.connect("activate", handler)
+                mi.connect("activate", self._menu_activate, action)
                 menu.append(mi)
+        menu.attach_to_widget(self, None)
         menu.show_all()
+        return menu
+
+    def _menu_activate(self, _item, action):
+        self._handle_action(action, self._context_menu_target)
+
+    def _show_context_menu(self, terminal, event):
+        self._context_menu_target = terminal
+        menu = self._context_menu
         try:
             menu.popup_at_pointer(event)
         except AttributeError:
@@ -938,31 +1244,34 @@ class TerminalWindow(Gtk.ApplicationWindow):
     # ── Session save / restore ─────────────────────────────────────────────────
 
     def _serialize_tree(self, widget):
-        if isinstance(widget, TerminalPane):
-            return {
-                "type": "terminal",
-                "cwd": widget.get_cwd() or os.environ.get("HOME", "/"),
-            }
-        if isinstance(widget, Gtk.Paned):
-            orient = (
-                "horizontal"
-                if widget.get_orientation() == Gtk.Orientation.HORIZONTAL
-                else "vertical"
-            )
-            c1 = widget.get_child1()
-            c2 = widget.get_child2()
-            return {
-                "type": "paned",
-                "orientation": orient,
-                "position": widget.get_position(),
-                "child1": self._serialize_tree(c1) if c1 else None,
-                "child2": self._serialize_tree(c2) if c2 else None,
-            }
-        if isinstance(widget, Gtk.Box):
-            children = widget.get_children()
-            if children:
-                return self._serialize_tree(children[0])
-        return None
+        """Serialize a pane tree to nested dicts (iterative walk)."""
+        root = None
+        # (widget, parent node or None for the root, slot in parent, depth)
+        stack = collections.deque([(widget, None, None, 0)])
+        while stack:
+            w, parent, slot, depth = stack.pop()
+            fn = _SERIALIZERS.get(type(w))
+            if fn is None or depth > MAX_PANE_DEPTH:
+                continue
+            node, children = fn(w)
+            if node is None:
+                holder = parent  # wrapper: children take over its slot
+            else:
+                holder = node
+                if parent is None:
+                    root = node
+                else:
+                    parent[slot] = node
+            # Push in reverse so the first child is visited first
+            for child_slot, child in reversed(children):
+                if child:
+                    stack.append((
+                        child,
+                        holder,
+                        slot if node is None else child_slot,
+                        depth + 1,
+                    ))
+        return root
 
     def save_session(self):
         session = {
@@ -970,124 +1279,199 @@ class TerminalWindow(Gtk.ApplicationWindow):
             "window_height": self.get_allocated_height(),
             "tabs": [],
         }
-        for i in range(self.notebook.get_n_pages()):
-            page = self.notebook.get_nth_page(i)
+        for page in self.notebook.get_children():
             tree = self._serialize_tree(page)
             if tree:
                 session["tabs"].append(tree)
+        # Write to a uniquely named temp file (mkstemp creates it 0600) and
+        # rename, so neither a crash nor another z4term process closing at
+        # the same time can leave a torn session file
         try:
-            fd = os.open(SESSION_FILE, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
-            with os.fdopen(fd, "w") as fh:
-                json.dump(session, fh, indent=2)
+            fd, tmp = tempfile.mkstemp(
+                prefix="session.", suffix=".tmp", dir=CONFIG_DIR
+            )
         except OSError:
-            pass
+            return
+        try:
+            # Large buffer so a typical session lands in a single write()
+            with os.fdopen(fd, "w", buffering=64 * 1024) as fh:
+                json.dump(session, fh, separators=(",", ":"))
+                fh.flush()
+                os.fsync(fh.fileno())
+            os.replace(tmp, SESSION_FILE)
+        except OSError:
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
 
     def _restore_tab(self, tab_data):
         widget = self._restore_tree(tab_data)
         if widget is None:
             return
         self._tab_counter += 1
+        # Left hidden; restore_or_init shows the whole window at once
         box = Gtk.Box(orientation=Gtk.Orientation.VERTICAL)
         box.pack_start(widget, True, True, 0)
-        box.show_all()
+        self._register_tab(box)
 
         label = Gtk.Label(label=f"Terminal {self._tab_counter}")
         ebox = Gtk.EventBox()
         ebox.add(label)
         ebox.connect("button-press-event", self._on_tab_label_click, box)
-        ebox.show_all()
+        label.show()
+        ebox.show()
 
-        idx = self.notebook.append_page(box, ebox)
-        self.notebook.set_current_page(idx)
+        self.notebook.append_page(box, ebox)
 
-    def _restore_tree(self, data, depth=0):
-        if data is None or depth > 20:
-            return None
-        if data.get("type") == "terminal":
-            return TerminalPane(self, cwd=data.get("cwd"))
-        if data.get("type") == "paned":
-            orient = (
-                Gtk.Orientation.HORIZONTAL
-                if data.get("orientation") == "horizontal"
-                else Gtk.Orientation.VERTICAL
-            )
-            paned = Gtk.Paned(orientation=orient)
-            paned.set_wide_handle(True)
-            c1 = self._restore_tree(data.get("child1"), depth + 1)
-            c2 = self._restore_tree(data.get("child2"), depth + 1)
-            if c1:
-                paned.pack1(c1, resize=True, shrink=True)
-            if c2:
-                paned.pack2(c2, resize=True, shrink=True)
-            pos = data.get("position")
-            if pos is not None:
-                GLib.idle_add(lambda p=pos: paned.set_position(p) or False)
-            return paned
-        return None
+    # Each restorer returns (widget, children): children are (slot, data)
+    # pairs for the Paned child slots 1 and 2
+
+    def _restore_terminal(self, node):
+        return TerminalPane(self, cwd=node.get("cwd")), ()
+
+    def _restore_paned(self, node):
+        orient = (
+            Gtk.Orientation.HORIZONTAL
+            if node.get("orientation") == "horizontal"
+            else Gtk.Orientation.VERTICAL
+        )
+        paned = Gtk.Paned(orientation=orient)
+        paned.set_wide_handle(True)
+        pos = node.get("position")
+        if pos is not None:
+            self._pending_positions.append((paned, pos))
+        return paned, ((1, node.get("child1")), (2, node.get("child2")))
+
+    _RESTORERS = {
+        "terminal": _restore_terminal,
+        "paned": _restore_paned,
+    }
+
+    def _restore_tree(self, data):
+        """Build a pane tree from serialized dicts (iterative walk)."""
+        root = None
+        # (node data, parent Paned or None for the root, child slot, depth)
+        stack = collections.deque([(data, None, 1, 0)])
+        while stack:
+            node, parent, slot, depth = stack.pop()
+            if node is None or depth > MAX_PANE_DEPTH:
+                continue
+            fn = self._RESTORERS.get(node.get("type"))
+            if fn is None:
+                continue
+            widget, children = fn(self, node)
+            for child_slot, child in reversed(children):
+                stack.append((child, widget, child_slot, depth + 1))
+            if parent is None:
+                root = widget
+            elif slot == 1:
+                parent.pack1(widget, resize=True, shrink=True)
+            else:
+                parent.pack2(widget, resize=True, shrink=True)
+        return root
 
     def _on_delete(self, _widget, _event):
         self.save_session()
         return False
 
+    def _on_destroy(self, _widget):
+        # Stop the title poll and drop pane references of the dead window
+        if self._title_poll_id:
+            GLib.source_remove(self._title_poll_id)
+            self._title_poll_id = 0
+        self._tab_panes.clear()
+        self._pane_to_tab.clear()
+
+    # ── Clipboard ──────────────────────────────────────────────────────────────
+
+    def _copy(self, t=None):
+        t = t or self.focused_terminal
+        if t:
+            t.copy_clipboard_format(Vte.Format.TEXT)
+
+    def _paste(self, t=None):
+        t = t or self.focused_terminal
+        if t:
+            t.paste_clipboard()
+
     # ── Keyboard handler ───────────────────────────────────────────────────────
 
     def _on_key(self, _widget, event):
-        kv = event.keyval
-        state = event.state & (
-            Gdk.ModifierType.CONTROL_MASK
-            | Gdk.ModifierType.SHIFT_MASK
-            | Gdk.ModifierType.MOD1_MASK
-        )
+        state = int(event.state) & _RELEVANT_MODS
+        # Plain typing: nothing below can match
+        if not state and not self._bare_keys:
+            return False
+        kv = Gdk.keyval_to_lower(event.keyval)
+        t = self.focused_terminal
 
         # Look up action in custom keymap
-        action = self._keymap.get((kv, state))
-        if action:
-            return self._handle_action(action)
+        fn = self._keymap.get((kv, state))
+        if fn:
+            fn(self, t)
+            return True
+
+        # Smart Ctrl+C / Ctrl+V only apply to Ctrl without Shift
+        if (state & _CTRL_SHIFT) != _CTRL:
+            return False
 
         # Smart Ctrl+C: copy if selection, else let VTE send SIGINT
-        ctrl = bool(state & Gdk.ModifierType.CONTROL_MASK)
-        shift = bool(state & Gdk.ModifierType.SHIFT_MASK)
-        if ctrl and not shift and kv in (Gdk.KEY_c, Gdk.KEY_C):
-            t = self.focused_terminal
+        if kv == Gdk.KEY_c:
             if t and t.get_has_selection():
                 t.copy_clipboard_format(Vte.Format.TEXT)
                 return True
             return False
 
         # Smart Ctrl+V: paste
-        if ctrl and not shift and kv in (Gdk.KEY_v, Gdk.KEY_V):
-            t = self.focused_terminal
+        if kv == Gdk.KEY_v:
             if t:
                 t.paste_clipboard()
                 return True
 
         return False
 
-    def _handle_action(self, action):
-        t = self.focused_terminal
-        dispatch = {
-            "split_vertical":
-                lambda: self.split_pane(Gtk.Orientation.HORIZONTAL),
-            "split_horizontal":
-                lambda: self.split_pane(Gtk.Orientation.VERTICAL),
-            "close_pane": self.close_pane,
-            "new_tab": self.add_tab,
-            "new_window": self._new_window,
-            "next_pane": self.navigate_next,
-            "search": self._toggle_search,
-            "zoom_in": lambda: self._zoom(1),
-            "zoom_out": lambda: self._zoom(-1),
-            "zoom_reset": lambda: self._zoom(0),
-            "next_tab": lambda: self._switch_tab(1),
-            "prev_tab": lambda: self._switch_tab(-1),
-            "copy":
-                lambda: t and t.copy_clipboard_format(Vte.Format.TEXT),
-            "paste":
-                lambda: t and t.paste_clipboard(),
-        }
-        fn = dispatch.get(action)
+    # Action name -> handler(window, terminal); a terminal of None means the
+    # focused one, and actions that don't act on a pane ignore it
+    _ACTIONS = {
+        "split_vertical":
+            lambda w, _t: w.split_pane(Gtk.Orientation.HORIZONTAL),
+        "split_horizontal":
+            lambda w, _t: w.split_pane(Gtk.Orientation.VERTICAL),
+        "close_pane": close_pane,
+        "new_tab": lambda w, _t: w.add_tab(),
+        "new_window": lambda w, _t: w._new_window(),
+        "next_pane": lambda w, _t: w.navigate_next(),
+        "search": lambda w, _t: w._toggle_search(),
+        "zoom_in": lambda w, _t: w._zoom(1),
+        "zoom_out": lambda w, _t: w._zoom(-1),
+        "zoom_reset": lambda w, _t: w._zoom(0),
+        "next_tab": lambda w, _t: w._switch_tab(1),
+        "prev_tab": lambda w, _t: w._switch_tab(-1),
+        "copy": _copy,
+        "paste": _paste,
+    }
+
+    # Resolved keymaps, shared by all windows with the same bindings
+    _keymap_cache = {}
+
+    @classmethod
+    def _keymap_for(cls, bindings):
+        """Return {(keyval, mods): handler} for a keybindings dict."""
+        key = tuple(sorted(bindings.items()))
+        km = cls._keymap_cache.get(key)
+        if km is None:
+            km = {
+                combo: cls._ACTIONS[action]
+                for combo, action in _build_keymap(bindings).items()
+                if action in cls._ACTIONS
+            }
+            cls._keymap_cache[key] = km
+        return km
+
+    def _handle_action(self, action, t=None):
+        fn = self._ACTIONS.get(action)
         if fn:
-            fn()
+            fn(self, t)
             return True
         return False
 
@@ -1096,7 +1480,6 @@ class TerminalWindow(Gtk.ApplicationWindow):
 
 class Z4TermApp(Gtk.Application):
     def __init__(self, config):
-        from gi.repository import Gio
         super().__init__(
             application_id="com.github.z4term",
             flags=Gio.ApplicationFlags.NON_UNIQUE,
@@ -1106,13 +1489,24 @@ class Z4TermApp(Gtk.Application):
     def do_activate(self):
         win = TerminalWindow(self.config, application=self)
         # Try to restore previous session
+        # Move the session aside first so it is consumed exactly once
         session = None
+        loading = SESSION_FILE + ".loading"
         try:
-            with open(SESSION_FILE) as fh:
-                session = json.load(fh)
-            os.remove(SESSION_FILE)
-        except (FileNotFoundError, json.JSONDecodeError, OSError):
+            os.replace(SESSION_FILE, loading)
+        except OSError:
             pass
+        else:
+            try:
+                with open(loading) as fh:
+                    session = json.load(fh)
+            except (OSError, ValueError):
+                pass
+            finally:
+                try:
+                    os.remove(loading)
+                except OSError:
+                    pass
         win.restore_or_init(session)
         win.present()
 